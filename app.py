@@ -1,10 +1,69 @@
-from flask import Flask,render_template
+import time
+
+_import_started = time.perf_counter()
+
+import os
+
+from flask import Flask, current_app
+
+from assets import AssetPipeline
+from config import configs
+from events import EventBroadcaster
+from menu import MenuCatalog
+from metrics import RequestMetrics
+from orders import OrderQueue
+from page_cache import PageCache
+from reports import SalesReports
+from server import serve_command
+from templating import init_templating, precompile_templates
+
+IMPORT_TIME = time.perf_counter() - _import_started
 
-app = Flask(__name__)
 
-@app.route('/')
 def home():
-    return render_template('index.html')
+    menu = current_app.extensions['menu'].current()
+    return current_app.extensions['page_cache'].render('index.html', menu_version=menu.version)
+
+
+def create_app(config=None):
+    """Build the cafe app from a config profile name ('dev'/'prod') or object.
+
+    Falls back to the ``PQ_CAFE_CONFIG`` environment variable, then 'dev'.
+    """
+    started = time.perf_counter()
+    if config is None:
+        config = os.environ.get('PQ_CAFE_CONFIG', 'dev')
+    if isinstance(config, str):
+        config = configs[config]
+
+    app = Flask(__name__)
+    app.config.from_object(config)
+    RequestMetrics(app)
+    init_templating(app)
+    AssetPipeline(app)
+    PageCache(app)
+    MenuCatalog(app)
+    EventBroadcaster(app)
+    OrderQueue(app)
+    SalesReports(app)
+    app.add_url_rule('/', 'home', home)
+    app.cli.add_command(serve_command)
+    constructed = time.perf_counter()
+
+    if app.config['PRELOAD_TEMPLATES']:
+        precompile_templates(app)
+    preloaded = time.perf_counter()
+
+    app.extensions['startup_timings'] = {
+        'import': IMPORT_TIME,
+        'construct': constructed - started,
+        'preload_templates': preloaded - constructed,
+    }
+    return app
+
 
+# No module-level app: importing this module must not open the orders
+# database or rebuild assets. ``flask --app app`` finds ``create_app``.
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app = create_app()
+    app.run(debug=app.config['DEBUG'])
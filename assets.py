@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+import click
+from flask import abort, current_app, request, send_from_directory, url_for
+
+COMPRESSIBLE = {'.css', '.js', '.html', '.svg', '.json', '.txt', '.xml', '.map'}
+ONE_YEAR = 365 * 24 * 3600
+
+
+class AssetPipeline:
+    """Content-hashed, gzip-precompressed copies of everything under static/.
+
+    ``build()`` copies ``static/css/style.css`` to
+    ``<build_dir>/css/style.<hash>.css`` plus a ``.gz`` sibling and records the
+    mapping in ``manifest.json``. Templates link through ``asset_url()`` and
+    the hashed files are served with far-future immutable caching, picking
+    the gzip variant when the client accepts it.
+    """
+
+    def __init__(self, app=None, url_prefix='/assets', build_dir='build/static'):
+        self.url_prefix = url_prefix
+        self.build_dir = build_dir
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_dir = app.static_folder
+        self.build_dir = os.path.join(app.root_path, self.build_dir)
+        app.add_url_rule(self.url_prefix + '/<path:filename>', 'assets', self.serve)
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.cli.add_command(build_assets_command)
+        app.extensions['assets'] = self
+        self.build()
+
+    def build(self):
+        """Hash and precompress every static file; return the manifest."""
+        manifest = {}
+        for root, _dirs, files in os.walk(self.static_dir):
+            for name in files:
+                source = os.path.join(root, name)
+                logical = os.path.relpath(source, self.static_dir).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+                stem, ext = os.path.splitext(logical)
+                hashed = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], ext)
+                target = os.path.join(self.build_dir, *hashed.split('/'))
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    _atomic_write(target, data)
+                    if ext.lower() in COMPRESSIBLE:
+                        packed = gzip.compress(data, compresslevel=9, mtime=0)
+                        if len(packed) < len(data):
+                            _atomic_write(target + '.gz', packed)
+                manifest[logical] = hashed
+        os.makedirs(self.build_dir, exist_ok=True)
+        with open(os.path.join(self.build_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        self.manifest = manifest
+        return manifest
+
+    def asset_url(self, filename):
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=hashed)
+
+    def serve(self, filename):
+        if filename.endswith('.gz') or filename == 'manifest.json':
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        gz_path = os.path.join(self.build_dir, *(filename + '.gz').split('/'))
+        if request.accept_encodings.quality('gzip') > 0 and os.path.isfile(gz_path):
+            response = send_from_directory(self.build_dir, filename + '.gz',
+                                           mimetype=mimetype, max_age=ONE_YEAR)
+            response.content_encoding = 'gzip'
+            response.headers.pop('Content-Disposition', None)
+        else:
+            response = send_from_directory(self.build_dir, filename,
+                                           mimetype=mimetype, max_age=ONE_YEAR)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def _atomic_write(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+@click.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress files under static/."""
+    manifest = current_app.extensions['assets'].build()
+    for logical, hashed in sorted(manifest.items()):
+        click.echo('%s -> %s' % (logical, hashed))
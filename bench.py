@@ -0,0 +1,294 @@
+"""Benchmarks for the cafe's hot routes.
+
+    python bench.py run --out bench-results.json
+    python bench.py compare bench-baseline.json bench-results.json --threshold 0.15
+
+``run`` measures each route twice: through the in-process Flask test client
+(framework and render cost only) and against ``flask serve`` started on a
+free local port, driven by concurrent keep-alive HTTP clients (Werkzeug's
+server answers every request with ``Connection: close``, so the clients
+reconnect as needed). ``compare`` exits non-zero when any metric regressed
+past the threshold, errors went up, or a baseline benchmark is missing.
+Compare runs from the same machine and settings only; ``meta`` in the
+report records where a run came from, and differing ``settings`` are
+reported as a warning.
+"""
+import argparse
+import datetime
+import http.client
+import importlib.metadata
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOWER_IS_BETTER = ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms')
+HIGHER_IS_BETTER = ('rps',)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'rps': count / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / count * 1000 if count else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_routes(app):
+    with app.test_request_context():
+        assets = app.extensions['assets']
+        return {
+            'home': '/',
+            'asset_css': assets.asset_url('css/style.css'),
+            'static_css': '/static/css/style.css',
+        }
+
+
+def run_in_process(app, routes, iterations, warmup):
+    client = app.test_client()
+    results = {}
+    for name, path in routes.items():
+        for _ in range(warmup):
+            client.get(path).close()
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            response = client.get(path)
+            response.close()
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                errors += 1
+        results[name] = summarize(latencies, time.perf_counter() - started, errors)
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, config):
+    command = [sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--config', config,
+               '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+               '--max-requests', '0', '--threaded']
+    log = open(os.path.join(HERE, 'bench_output.txt'), 'w')
+    process = subprocess.Popen(command, cwd=HERE, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited early, see bench_output.txt')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('server did not start listening on port %d' % port)
+
+
+def _client(port, path, deadline, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {'Accept-Encoding': 'gzip'}
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - t0)
+        if response.status != 200:
+            errors.append(1)
+    conn.close()
+
+
+def run_over_http(routes, port, concurrency, duration, warmup):
+    results = {}
+    for name, path in routes.items():
+        _client(port, path, time.perf_counter() + warmup, [], [])
+        latencies = []
+        errors = []
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=_client, args=(port, path, deadline, latencies, errors))
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results[name] = summarize(latencies, time.perf_counter() - started, len(errors))
+    return results
+
+
+def machine_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'flask': importlib.metadata.version('flask'),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'hostname': platform.node(),
+    }
+
+
+def command_run(args):
+    args.out = os.path.abspath(args.out)
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+    from app import create_app
+
+    app = create_app(args.config)
+    routes = bench_routes(app)
+    report = {
+        'meta': machine_metadata(),
+        'settings': {
+            'config': args.config,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'workers': args.workers,
+        },
+        'results': {},
+    }
+    for name, stats in run_in_process(app, routes, args.iterations, args.warmup).items():
+        report['results']['inprocess.' + name] = stats
+    if not args.skip_server:
+        port = free_port()
+        process = start_server(port, args.workers, args.config)
+        try:
+            for name, stats in run_over_http(routes, port, args.concurrency, args.duration,
+                                             warmup=min(1.0, args.duration)).items():
+                report['results']['server.' + name] = stats
+        finally:
+            process.terminate()
+            process.wait(15)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    for name, stats in sorted(report['results'].items()):
+        print('%-24s %9.0f req/s  p50 %7.3f ms  p95 %7.3f ms  p99 %7.3f ms  errors %d'
+              % (name, stats['rps'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+                 stats['errors']))
+    print('Wrote %s' % args.out)
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """Yield (benchmark, metric, old, new, change, regressed) per baseline metric.
+
+    A benchmark missing from ``current`` and any rise in ``errors`` count as
+    regressions; ``change`` is None for those rows.
+    """
+    for name, old_stats in sorted(baseline['results'].items()):
+        new_stats = current['results'].get(name)
+        if new_stats is None:
+            yield name, 'missing', None, None, None, True
+            continue
+        old_errors, new_errors = old_stats.get('errors', 0), new_stats.get('errors', 0)
+        yield name, 'errors', old_errors, new_errors, None, new_errors > old_errors
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = old_stats.get(metric), new_stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if metric in LOWER_IS_BETTER:
+                regressed = change > threshold
+            else:
+                regressed = change < -threshold
+            yield name, metric, old, new, change, regressed
+
+
+def command_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    old_settings, new_settings = baseline.get('settings', {}), current.get('settings', {})
+    for key in sorted(set(old_settings) | set(new_settings)):
+        if old_settings.get(key) != new_settings.get(key):
+            print('warning: setting %r differs: baseline %r, current %r'
+                  % (key, old_settings.get(key), new_settings.get(key)), file=sys.stderr)
+    failures = 0
+    for name, metric, old, new, change, regressed in compare(baseline, current, args.threshold):
+        failures += regressed
+        flag = '  REGRESSION' if regressed else ''
+        if metric == 'missing':
+            print('%-24s missing from current results%s' % (name, flag))
+        elif change is None:
+            print('%-24s %-8s %12d -> %12d%s' % (name, metric, old, new, flag))
+        else:
+            print('%-24s %-8s %12.3f -> %12.3f  %+7.1f%%%s'
+                  % (name, metric, old, new, change * 100, flag))
+    if failures:
+        print('%d metric(s) regressed (threshold %.0f%%)' % (failures, args.threshold * 100))
+        return 1
+    print('No regressions beyond %.0f%%' % (args.threshold * 100))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks and write a JSON report')
+    run.add_argument('--out', default='bench-results.json')
+    run.add_argument('--config', default='prod')
+    run.add_argument('--iterations', type=int, default=2000,
+                     help='requests per route through the test client')
+    run.add_argument('--warmup', type=int, default=200)
+    run.add_argument('--concurrency', type=int, default=8,
+                     help='keep-alive client connections per route')
+    run.add_argument('--duration', type=float, default=5.0,
+                     help='seconds to drive each route over HTTP')
+    run.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    run.add_argument('--skip-server', action='store_true',
+                     help='only run the in-process benchmarks')
+    run.set_defaults(func=command_run)
+
+    cmp_ = commands.add_parser('compare', help='fail if results regressed against a baseline')
+    cmp_.add_argument('baseline')
+    cmp_.add_argument('current')
+    cmp_.add_argument('--threshold', type=float, default=0.15,
+                      help='allowed relative slowdown, 0.15 = 15%%')
+    cmp_.set_defaults(func=command_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
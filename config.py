@@ -0,0 +1,48 @@
+import os
+
+
+class Config:
+    DEBUG = False
+    PRELOAD_TEMPLATES = True
+    TEMPLATE_BYTECODE_CACHE = True
+    TEMPLATE_BYTECODE_DIR = None
+    FRAGMENT_CACHE_SIZE = 256
+    FRAGMENT_CACHE_TTL = 300
+    PAGE_CACHE_CHECK_INTERVAL = 1.0
+    PAGE_CACHE_SIZE = 128
+    MENU_PATH = 'data/menu.json'
+    MENU_CHECK_INTERVAL = 1.0
+    ORDERS_DB = None
+    ORDERS_QUEUE_SIZE = 10000
+    ORDERS_BATCH_SIZE = 500
+    ORDERS_FLUSH_INTERVAL = 0.05
+    ORDERS_RETRY_AFTER = 1
+    EVENTS_REPLAY_SIZE = 256
+    EVENTS_BUFFER_SIZE = 64
+    EVENTS_HEARTBEAT = 15.0
+    EVENTS_MAX_SUBSCRIBERS = 1000
+    METRICS_SLOW_REQUEST_MS = 500
+    SERVE_HOST = '127.0.0.1'
+    SERVE_PORT = 5000
+    SERVE_WORKERS = os.cpu_count() or 1
+    SERVE_MAX_REQUESTS = 0
+
+
+class DevConfig(Config):
+    DEBUG = True
+    PRELOAD_TEMPLATES = False
+    PAGE_CACHE_CHECK_INTERVAL = 0.0
+    MENU_CHECK_INTERVAL = 0.0
+    SERVE_WORKERS = 1
+
+
+class ProdConfig(Config):
+    SERVE_HOST = '0.0.0.0'
+    SERVE_PORT = 8000
+    SERVE_MAX_REQUESTS = 10000
+
+
+configs = {
+    'dev': DevConfig,
+    'prod': ProdConfig,
+}
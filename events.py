@@ -0,0 +1,163 @@
+import itertools
+import json
+import threading
+from collections import OrderedDict, deque
+
+from flask import Response, jsonify, request
+
+
+class Subscriber:
+    """Pending events for one open stream, bounded to ``maxlen`` entries.
+
+    Events published with a ``key`` replace any still-unsent event with the
+    same key, so a slow display only sees the latest state of each order.
+    When the buffer overflows the oldest entry is dropped and counted.
+    """
+
+    __slots__ = ('buffer', 'maxlen', 'dropped', 'wakeup')
+
+    def __init__(self, maxlen):
+        self.buffer = OrderedDict()
+        self.maxlen = maxlen
+        self.dropped = 0
+        self.wakeup = threading.Event()
+
+    def push(self, slot, chunk):
+        self.buffer.pop(slot, None)
+        self.buffer[slot] = chunk
+        if len(self.buffer) > self.maxlen:
+            self.buffer.popitem(last=False)
+            self.dropped += 1
+        self.wakeup.set()
+
+
+class EventBroadcaster:
+    """In-process Server-Sent Events fan-out served at ``/events``.
+
+    ``publish()`` encodes an event once and hands the same bytes to every
+    subscriber's buffer. The last ``replay_size`` events are kept so that a
+    reconnecting client sending ``Last-Event-ID`` picks up where it left off;
+    a client whose id has fallen out of the log gets a ``reset`` event
+    instead and should refetch its state. Idle streams receive a comment
+    line every ``heartbeat`` seconds.
+
+    The broadcaster lives in one process: under ``flask serve`` each worker
+    has its own, so run event streams on a single ``--threaded`` worker. A
+    stream would pin a single-threaded server forever, so ``/events``
+    answers 503 when the WSGI server is not multithreaded.
+    """
+
+    def __init__(self, app=None, replay_size=None, buffer_size=None,
+                 heartbeat=None, max_subscribers=None):
+        self.replay_size = replay_size
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.closed = False
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._log = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        if self.replay_size is None:
+            self.replay_size = config.get('EVENTS_REPLAY_SIZE', 256)
+        if self.buffer_size is None:
+            self.buffer_size = config.get('EVENTS_BUFFER_SIZE', 64)
+        if self.heartbeat is None:
+            self.heartbeat = config.get('EVENTS_HEARTBEAT', 15.0)
+        if self.max_subscribers is None:
+            self.max_subscribers = config.get('EVENTS_MAX_SUBSCRIBERS', 1000)
+        self._log = deque(maxlen=self.replay_size)
+        app.add_url_rule('/events', 'events', self.stream)
+        app.extensions['events'] = self
+        app.extensions.setdefault('shutdown_hooks', []).append(self.close)
+
+    def publish(self, event, data, key=None):
+        """Send ``data`` (JSON-serialisable) as ``event`` to every subscriber."""
+        payload = json.dumps(data, separators=(',', ':'))
+        with self._lock:
+            event_id = next(self._ids)
+            chunk = ('id: %d\nevent: %s\ndata: %s\n\n' % (event_id, event, payload)).encode('utf-8')
+            self._last_id = event_id
+            self._log.append((event_id, chunk))
+            slot = (event, key) if key is not None else event_id
+            for subscriber in self.subscribers:
+                subscriber.push(slot, chunk)
+        return event_id
+
+    def close(self):
+        self.closed = True
+        with self._lock:
+            for subscriber in self.subscribers:
+                subscriber.wakeup.set()
+
+    def _subscribe(self, last_event_id):
+        subscriber = Subscriber(self.buffer_size)
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None, None
+            if last_event_id is None:
+                backlog = []
+            elif self._log and self._log[0][0] <= last_event_id + 1 and last_event_id <= self._last_id:
+                backlog = [chunk for event_id, chunk in self._log if event_id > last_event_id]
+            elif not self._log and last_event_id == self._last_id:
+                backlog = []
+            else:
+                backlog = [b'event: reset\ndata: {}\n\n']
+            self.subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def _unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def _drain(self, subscriber):
+        with self._lock:
+            subscriber.wakeup.clear()
+            chunks = list(subscriber.buffer.values())
+            subscriber.buffer.clear()
+            dropped, subscriber.dropped = subscriber.dropped, 0
+        if dropped:
+            chunks.insert(0, ('event: overflow\ndata: {"dropped":%d}\n\n' % dropped).encode('ascii'))
+        return b''.join(chunks)
+
+    def _generate(self, subscriber, backlog):
+        try:
+            yield b'retry: 3000\n\n' + b''.join(backlog)
+            while not self.closed:
+                if not subscriber.wakeup.wait(self.heartbeat):
+                    yield b': keepalive\n\n'
+                    continue
+                data = self._drain(subscriber)
+                if data:
+                    yield data
+        finally:
+            self._unsubscribe(subscriber)
+
+    def stream(self):
+        if not request.environ.get('wsgi.multithread'):
+            response = jsonify(error='event streams need a threaded server '
+                                     '(flask serve --threaded)')
+            response.status_code = 503
+            return response
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                last_event_id = -1
+        subscriber, backlog = self._subscribe(last_event_id)
+        if subscriber is None:
+            response = jsonify(error='too many event subscribers')
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        response = Response(self._generate(subscriber, backlog), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,315 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from decimal import Decimal
+
+from flask import jsonify, request
+
+SORT_KEYS = ('name', '-name', 'price', '-price', 'category', '-category')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+QUERY_MEMO_SIZE = 512
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+class MenuError(ValueError):
+    """Raised for a malformed menu file or an invalid menu query."""
+
+
+class MenuItem:
+    __slots__ = ('id', 'name', 'category', 'price_cents', 'tags', 'available')
+
+    def __init__(self, id, name, category, price_cents, tags, available):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.price_cents = price_cents
+        self.tags = tags
+        self.available = available
+
+    @classmethod
+    def from_dict(cls, data):
+        try:
+            price = Decimal(str(data['price']))
+            cents = price * 100
+            if not cents.is_finite() or cents < 0 or cents != cents.to_integral_value():
+                raise MenuError('invalid menu item %r: price must be a whole number of cents '
+                                'and not negative' % (data,))
+            return cls(
+                str(data['id']),
+                str(data['name']),
+                str(data['category']),
+                int(cents),
+                tuple(sorted(str(t) for t in data.get('tags', ()))),
+                bool(data.get('available', True)),
+            )
+        except (KeyError, TypeError, ArithmeticError) as exc:
+            raise MenuError('invalid menu item %r: %s' % (data, exc)) from exc
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'price': self.price_cents / 100,
+            'tags': list(self.tags),
+            'available': self.available,
+        }
+
+
+class MenuSnapshot:
+    """Immutable, fully indexed view of one version of the menu file.
+
+    Items are addressed by their position in ``items``. Category, tag and
+    availability lookups are precomputed position sets, every sort order is a
+    rank array, and name search goes through a sorted word list probed with
+    bisect, so a query never scans the whole menu.
+    """
+
+    def __init__(self, items, version):
+        self.version = version
+        self.items = tuple(items)
+        self.by_id = {}
+        for pos, item in enumerate(self.items):
+            if item.id in self.by_id:
+                raise MenuError('duplicate menu item id %r' % item.id)
+            self.by_id[item.id] = pos
+        self.payloads = tuple(item.as_dict() for item in self.items)
+        self.all = frozenset(range(len(self.items)))
+
+        by_category = {}
+        by_tag = {}
+        available = set()
+        words = []
+        for pos, item in enumerate(self.items):
+            by_category.setdefault(item.category, set()).add(pos)
+            for tag in item.tags:
+                by_tag.setdefault(tag, set()).add(pos)
+            if item.available:
+                available.add(pos)
+            for word in set(_WORD.findall(item.name.lower())):
+                words.append((word, pos))
+        self.by_category = {k: frozenset(v) for k, v in by_category.items()}
+        self.by_tag = {k: frozenset(v) for k, v in by_tag.items()}
+        self.available = frozenset(available)
+        words.sort()
+        self.words = [w for w, _ in words]
+        self.word_positions = array('I', (p for _, p in words))
+
+        # Sort keys end in the item id, which is unique and survives reloads,
+        # so they double as keyset pagination cursors.
+        self.orders = {}
+        self.ranks = {}
+        self.sort_keys = {}
+        sort_fields = {
+            'name': lambda item: (item.name.lower(), item.id),
+            'price': lambda item: (item.price_cents, item.id),
+            'category': lambda item: (item.category, item.name.lower(), item.id),
+        }
+        for field, key in sort_fields.items():
+            keys = tuple(key(item) for item in self.items)
+            ascending = sorted(range(len(self.items)), key=keys.__getitem__)
+            self.sort_keys[field] = self.sort_keys['-' + field] = keys
+            for sort, order in ((field, ascending), ('-' + field, ascending[::-1])):
+                rank = array('I', bytes(4 * len(order)))
+                for r, pos in enumerate(order):
+                    rank[pos] = r
+                self.orders[sort] = array('I', order)
+                self.ranks[sort] = rank
+
+        sections = OrderedDict()
+        for pos in self.orders['category']:
+            item = self.items[pos]
+            sections.setdefault(item.category, []).append(item)
+        self.sections = tuple((category, tuple(items)) for category, items in sections.items())
+
+        self._memo = {}
+
+    def search_prefix(self, prefix):
+        lo = bisect_left(self.words, prefix)
+        hi = bisect_left(self.words, prefix + '\uffff', lo)
+        return frozenset(self.word_positions[lo:hi])
+
+    def _matching(self, category, tags, q, available):
+        sets = []
+        if category is not None:
+            sets.append(self.by_category.get(category, frozenset()))
+        for tag in tags:
+            sets.append(self.by_tag.get(tag, frozenset()))
+        if available is not None:
+            sets.append(self.available if available else self.all - self.available)
+        if q and not q.isspace():
+            words = _WORD.findall(q.lower())
+            if not words:
+                # Punctuation alone matches no name, not every name.
+                sets.append(frozenset())
+            for word in words:
+                sets.append(self.search_prefix(word))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            if not result:
+                break
+            result = result & other
+        return result
+
+    def query(self, category=None, tags=(), q=None, available=None, sort='name'):
+        """Return item positions matching the filters, ordered by ``sort``."""
+        if sort not in self.orders:
+            raise MenuError('sort must be one of %s' % ', '.join(SORT_KEYS))
+        key = (category, tuple(sorted(tags)), q, available, sort)
+        hit = self._memo.get(key)
+        if hit is not None:
+            return hit
+        matching = self._matching(category, tags, q, available)
+        if matching is None:
+            result = self.orders[sort]
+        else:
+            result = array('I', sorted(matching, key=self.ranks[sort].__getitem__))
+        if len(self._memo) >= QUERY_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = result
+        return result
+
+    def page(self, positions, sort, cursor=None, limit=DEFAULT_LIMIT):
+        """Slice ``positions`` after ``cursor``; return (payloads, next_cursor).
+
+        The cursor carries the sort key of the last item returned, so paging
+        stays correct when the menu is reloaded between requests.
+        """
+        keys = self.sort_keys[sort]
+        start = 0
+        if cursor is not None:
+            after = decode_cursor(cursor, sort)
+            try:
+                if sort.startswith('-'):
+                    start = len(positions) - bisect_left(
+                        positions[::-1], after, key=keys.__getitem__)
+                else:
+                    start = bisect_right(positions, after, key=keys.__getitem__)
+            except TypeError as exc:
+                raise MenuError('invalid cursor') from exc
+        chunk = positions[start:start + limit]
+        payloads = [self.payloads[p] for p in chunk]
+        next_cursor = None
+        if start + limit < len(positions):
+            next_cursor = encode_cursor(sort, keys[chunk[-1]])
+        return payloads, next_cursor
+
+
+def encode_cursor(sort, key):
+    raw = json.dumps([sort, list(key)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, key = json.loads(raw)
+        key = tuple(key)
+    except (ValueError, TypeError) as exc:
+        raise MenuError('invalid cursor') from exc
+    if cursor_sort != sort:
+        raise MenuError('cursor does not match sort %r' % sort)
+    return key
+
+
+def load_snapshot(path):
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('items')
+    if not isinstance(data, list):
+        raise MenuError('%s must hold a list of items' % path)
+    items = [MenuItem.from_dict(entry) for entry in data]
+    return MenuSnapshot(items, (stat.st_mtime_ns, stat.st_size))
+
+
+class MenuCatalog:
+    """Menu loaded once from a JSON file and served from in-memory indexes.
+
+    The source file is re-checked at most every ``check_interval`` seconds.
+    When it changed, one request thread builds a new ``MenuSnapshot`` while
+    the others keep answering from the old one; the new snapshot is then
+    swapped in with a single reference assignment. A file that fails to
+    parse leaves the previous snapshot in place.
+    """
+
+    def __init__(self, app=None, path=None, check_interval=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.snapshot = None
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.path is None:
+            self.path = os.path.join(app.root_path, app.config.get('MENU_PATH', 'data/menu.json'))
+        if self.check_interval is None:
+            self.check_interval = app.config.get('MENU_CHECK_INTERVAL', 1.0)
+        self.logger = app.logger
+        self.snapshot = load_snapshot(self.path)
+        self._last_check = time.monotonic()
+        app.add_url_rule('/api/menu', 'menu_api', self.api)
+        app.add_template_global(lambda: self.current().sections, 'menu_sections')
+        app.extensions['menu'] = self
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval and self._reload_lock.acquire(blocking=False):
+            try:
+                self._last_check = now
+                self._maybe_reload()
+            finally:
+                self._reload_lock.release()
+        return self.snapshot
+
+    def _maybe_reload(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_mtime_ns, stat.st_size) == self.snapshot.version:
+            return
+        try:
+            self.snapshot = load_snapshot(self.path)
+        except (OSError, ValueError) as exc:
+            self.logger.error('Keeping previous menu, reload of %s failed: %s', self.path, exc)
+        else:
+            self.logger.info('Reloaded menu from %s (%d items)', self.path, len(self.snapshot.items))
+
+    def api(self):
+        args = request.args
+        try:
+            sort = args.get('sort', 'name')
+            limit = int(args.get('limit', DEFAULT_LIMIT))
+            if not 1 <= limit <= MAX_LIMIT:
+                raise MenuError('limit must be between 1 and %d' % MAX_LIMIT)
+            available = args.get('available')
+            if available is not None:
+                if available not in ('true', 'false', '1', '0'):
+                    raise MenuError('available must be true or false')
+                available = available in ('true', '1')
+            snapshot = self.current()
+            positions = snapshot.query(
+                category=args.get('category'),
+                tags=args.getlist('tag'),
+                q=args.get('q'),
+                available=available,
+                sort=sort,
+            )
+            items, next_cursor = snapshot.page(positions, sort, args.get('cursor'), limit)
+        except ValueError as exc:
+            return jsonify(error=str(exc)), 400
+        return jsonify(items=items, total=len(positions), next_cursor=next_cursor)
@@ -0,0 +1,152 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, before_render_template, g, request, template_rendered
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class RequestMetrics:
+    """Per-endpoint request counters and latency histograms at ``/metrics``.
+
+    Requests are timed from ``before_request`` to ``after_request``; time
+    spent inside Jinja is measured separately through the
+    ``before_render_template`` / ``template_rendered`` signals. Requests
+    slower than ``METRICS_SLOW_REQUEST_MS`` are logged with a render/other
+    breakdown. Numbers are per process, like everything else held in memory
+    here.
+    """
+
+    def __init__(self, app=None, slow_request_ms=None):
+        self.slow_request_ms = slow_request_ms
+        self.requests = {}
+        self.latency = {}
+        self.render = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.slow_request_ms is None:
+            self.slow_request_ms = app.config.get('METRICS_SLOW_REQUEST_MS', 500)
+        self.logger = app.logger
+        self.extensions = app.extensions
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+        app.extensions['metrics'] = self
+
+    def _start(self):
+        g._metrics_started = time.perf_counter()
+        g._metrics_render = 0.0
+
+    def _render_started(self, sender, template, context, **extra):
+        g._metrics_render_started = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        started = g.pop('_metrics_render_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        g._metrics_render = g.get('_metrics_render', 0.0) + elapsed
+        name = template.name or '<string>'
+        with self._lock:
+            histogram = self.render.get(name)
+            if histogram is None:
+                histogram = self.render[name] = Histogram()
+            histogram.observe(elapsed)
+
+    def _finish(self, response):
+        started = g.get('_metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or '<unmatched>'
+        key = (endpoint, request.method, response.status_code)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram()
+            histogram.observe(elapsed)
+        if elapsed * 1000 >= self.slow_request_ms:
+            render = g.get('_metrics_render', 0.0)
+            self.logger.warning(
+                'Slow request %s %s -> %d: %.1f ms total (render %.1f ms, other %.1f ms)',
+                request.method, request.path, response.status_code,
+                elapsed * 1000, render * 1000, (elapsed - render) * 1000)
+        return response
+
+    def export(self):
+        with self._lock:
+            requests = sorted(self.requests.items())
+            latency = sorted((k, _copy(h)) for k, h in self.latency.items())
+            render = sorted((k, _copy(h)) for k, h in self.render.items())
+        lines = [
+            '# HELP pqcafe_http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE pqcafe_http_requests_total counter',
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append('pqcafe_http_requests_total{endpoint="%s",method="%s",status="%d"} %d'
+                         % (_escape(endpoint), method, status, count))
+        lines += _histogram_lines('pqcafe_http_request_duration_seconds',
+                                  'Time from before_request to after_request.',
+                                  'endpoint', latency)
+        lines += _histogram_lines('pqcafe_template_render_seconds',
+                                  'Time spent rendering each Jinja template.',
+                                  'template', render)
+        orders = self.extensions.get('orders')
+        if orders is not None:
+            lines += ['# HELP pqcafe_orders_pending Orders queued but not yet written.',
+                      '# TYPE pqcafe_orders_pending gauge',
+                      'pqcafe_orders_pending %d' % orders.pending()]
+        events = self.extensions.get('events')
+        if events is not None:
+            lines += ['# HELP pqcafe_event_subscribers Open /events streams.',
+                      '# TYPE pqcafe_event_subscribers gauge',
+                      'pqcafe_event_subscribers %d' % len(events.subscribers)]
+        return Response('\n'.join(lines) + '\n',
+                        mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _copy(histogram):
+    copy = Histogram()
+    copy.counts = list(histogram.counts)
+    copy.total = histogram.total
+    copy.count = histogram.count
+    return copy
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name, help_text, label, histograms):
+    lines = ['# HELP %s %s' % (name, help_text), '# TYPE %s histogram' % name]
+    for key, histogram in histograms:
+        key = _escape(key)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append('%s_bucket{%s="%s",le="%g"} %d' % (name, label, key, bound, cumulative))
+        lines.append('%s_bucket{%s="%s",le="+Inf"} %d' % (name, label, key, histogram.count))
+        lines.append('%s_sum{%s="%s"} %r' % (name, label, key, histogram.total))
+        lines.append('%s_count{%s="%s"} %d' % (name, label, key, histogram.count))
+    return lines
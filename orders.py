@@ -0,0 +1,349 @@
+import atexit
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app, jsonify, request
+
+MAX_LINES = 50
+MAX_QTY = 99
+STATUSES = ('received', 'preparing', 'ready', 'collected', 'cancelled')
+# Moves the kitchen flow allows; a cancelled order can only be reinstated.
+TRANSITIONS = {
+    'received': ('preparing', 'ready', 'cancelled'),
+    'preparing': ('ready', 'cancelled'),
+    'ready': ('collected', 'cancelled'),
+    'collected': (),
+    'cancelled': ('received',),
+}
+_ORDER_ID = re.compile(r'[0-9a-f]{32}')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    customer TEXT,
+    item_count INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL REFERENCES orders(id),
+    item_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    unit_price_cents INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS order_items_order_id ON order_items(order_id);
+"""
+
+_STOP = object()
+
+
+class OrderError(ValueError):
+    """Raised when a submitted order fails validation."""
+
+
+class QueueClosed(RuntimeError):
+    """Raised by ``OrderQueue.submit`` once the writer has been shut down."""
+
+
+class Order:
+    __slots__ = ('id', 'created_at', 'status', 'customer', 'lines', 'total_cents')
+
+    def __init__(self, id, created_at, customer, lines):
+        self.id = id
+        self.created_at = created_at
+        self.status = 'received'
+        self.customer = customer
+        self.lines = lines
+        self.total_cents = sum(qty * price for _item_id, _name, qty, price in lines)
+
+    @property
+    def item_count(self):
+        return sum(qty for _item_id, _name, qty, _price in self.lines)
+
+
+class StatusChange:
+    __slots__ = ('order_id', 'status')
+
+    def __init__(self, order_id, status):
+        self.order_id = order_id
+        self.status = status
+
+
+def parse_order(data, snapshot):
+    """Validate a JSON order body against the current menu snapshot."""
+    if not isinstance(data, dict):
+        raise OrderError('order must be a JSON object')
+    lines = data.get('items')
+    if not isinstance(lines, list) or not lines:
+        raise OrderError('items must be a non-empty list')
+    if len(lines) > MAX_LINES:
+        raise OrderError('an order may have at most %d lines' % MAX_LINES)
+    customer = data.get('customer')
+    if customer is not None and not isinstance(customer, str):
+        raise OrderError('customer must be a string')
+    parsed = []
+    for line in lines:
+        if not isinstance(line, dict):
+            raise OrderError('each item must be an object with id and qty')
+        item_id = line.get('id')
+        qty = line.get('qty', 1)
+        pos = snapshot.by_id.get(item_id) if isinstance(item_id, str) else None
+        if pos is None:
+            raise OrderError('unknown menu item %r' % (item_id,))
+        item = snapshot.items[pos]
+        if not item.available:
+            raise OrderError('%s is not available right now' % item.name)
+        if not isinstance(qty, int) or isinstance(qty, bool) or not 1 <= qty <= MAX_QTY:
+            raise OrderError('qty must be an integer between 1 and %d' % MAX_QTY)
+        parsed.append((item.id, item.name, qty, item.price_cents))
+    return Order(uuid.uuid4().hex, time.time(), customer and customer[:100], parsed)
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class OrderQueue:
+    """Write-behind order ingestion into SQLite.
+
+    ``POST /orders`` validates the order, hands it to a bounded in-process
+    queue and returns the new order id straight away. Status changes posted
+    to ``/orders/<id>/status`` travel through the same queue, so they are
+    applied in order after the order itself; one for an unknown order or
+    outside ``TRANSITIONS`` is skipped with a warning. A single writer thread per
+    process drains the queue and commits up to ``batch_size`` entries per
+    transaction with ``executemany``, waiting at most ``flush_interval``
+    seconds for a batch to fill. Callables in ``commit_hooks`` run inside that
+    transaction as ``hook(conn, orders, [(status_change, previous_status)])``;
+    a hook that raises is rolled back and logged without losing the batch.
+    Once a batch is committed each order and status change is published as
+    an ``order`` event when an ``EventBroadcaster`` is registered. A batch
+    that fails to commit is logged and dropped; the writer carries on with
+    the next one. A full queue is answered with 429 and Retry-After.
+    ``close()`` drains and commits whatever is still queued; it runs at
+    interpreter exit and from the ``shutdown_hooks`` that ``flask serve``
+    workers call before exiting. Orders arriving after that get a 503.
+    Orders still in the queue when a process is killed outright are lost.
+    """
+
+    def __init__(self, app=None, path=None, maxsize=None, batch_size=None,
+                 flush_interval=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pid = None
+        self._queue = None
+        self._writer = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self.commit_hooks = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        if self.path is None:
+            self.path = config.get('ORDERS_DB') or os.path.join(app.instance_path, 'orders.sqlite3')
+        if self.maxsize is None:
+            self.maxsize = config.get('ORDERS_QUEUE_SIZE', 10000)
+        if self.batch_size is None:
+            self.batch_size = config.get('ORDERS_BATCH_SIZE', 500)
+        if self.flush_interval is None:
+            self.flush_interval = config.get('ORDERS_FLUSH_INTERVAL', 0.05)
+        self.retry_after = config.get('ORDERS_RETRY_AFTER', 1)
+        self.logger = app.logger
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connect(self.path).close()
+        self.events = app.extensions.get('events')
+        app.add_url_rule('/orders', 'create_order', self.create, methods=['POST'])
+        app.add_url_rule('/orders/<order_id>/status', 'update_order_status',
+                         self.update_status, methods=['POST'])
+        app.extensions['orders'] = self
+        app.extensions.setdefault('shutdown_hooks', []).append(self.close)
+        atexit.register(self.close)
+
+    def _ensure_writer(self):
+        # Threads do not survive fork(), so each worker process starts its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._closed = False
+            self._queue = queue.Queue(self.maxsize)
+            self._writer = threading.Thread(target=self._run, name='order-writer', daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def submit(self, entry):
+        """Enqueue an order or status change.
+
+        Raises ``queue.Full`` when the queue is full and ``QueueClosed`` after
+        ``close()``.
+        """
+        self._ensure_writer()
+        with self._lock:
+            if self._closed:
+                raise QueueClosed('order queue is closed')
+            self._queue.put_nowait(entry)
+
+    def pending(self):
+        return self._queue.qsize() if self._pid == os.getpid() else 0
+
+    def close(self, timeout=30):
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self._writer.is_alive():
+                return
+            # Taken under the lock so no submit() can slip in behind _STOP.
+            self._queue.put(_STOP)
+        self._writer.join(timeout)
+
+    def _busy(self):
+        response = jsonify(error='too many orders in flight, retry shortly')
+        response.status_code = 429
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+    def _closing(self):
+        response = jsonify(error='not taking orders, server is shutting down')
+        response.status_code = 503
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+    def create(self):
+        try:
+            order = parse_order(request.get_json(silent=True),
+                                current_app.extensions['menu'].current())
+        except OrderError as exc:
+            return jsonify(error=str(exc)), 400
+        try:
+            self.submit(order)
+        except queue.Full:
+            return self._busy()
+        except QueueClosed:
+            return self._closing()
+        return jsonify(id=order.id, status=order.status,
+                       total=order.total_cents / 100), 202
+
+    def update_status(self, order_id):
+        if not _ORDER_ID.fullmatch(order_id):
+            return jsonify(error='unknown order %r' % order_id), 404
+        data = request.get_json(silent=True)
+        status = data.get('status') if isinstance(data, dict) else None
+        if status not in STATUSES:
+            return jsonify(error='status must be one of %s' % ', '.join(STATUSES)), 400
+        try:
+            self.submit(StatusChange(order_id, status))
+        except queue.Full:
+            return self._busy()
+        except QueueClosed:
+            return self._closing()
+        return jsonify(id=order_id, status=status), 202
+
+    def _run(self):
+        conn = connect(self.path)
+        stopping = False
+        try:
+            while not stopping:
+                batch = []
+                order = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if order is _STOP:
+                        stopping = True
+                        break
+                    batch.append(order)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        order = (self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    continue
+                # A failing commit hook or event publish must not kill the
+                # writer, or every later order would sit in the queue forever.
+                try:
+                    self._flush(conn, batch)
+                except Exception:
+                    self._lost(batch)
+        finally:
+            conn.close()
+
+    def _flush(self, conn, batch, attempts=5):
+        orders = [o for o in batch if isinstance(o, Order)]
+        changes = [c for c in batch if isinstance(c, StatusChange)]
+        order_rows = [(o.id, o.created_at, o.status, o.customer, o.item_count, o.total_cents)
+                      for o in orders]
+        line_rows = [(o.id, item_id, name, qty, price)
+                     for o in orders for item_id, name, qty, price in o.lines]
+        for attempt in range(attempts):
+            try:
+                with conn:
+                    conn.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)', order_rows)
+                    conn.executemany('INSERT INTO order_items VALUES (?, ?, ?, ?, ?)', line_rows)
+                    applied = []
+                    skipped = []
+                    for c in changes:
+                        row = conn.execute('SELECT status FROM orders WHERE id = ?',
+                                           (c.order_id,)).fetchone()
+                        if row is None or c.status not in TRANSITIONS[row[0]]:
+                            skipped.append((c, row and row[0]))
+                            continue
+                        conn.execute('UPDATE orders SET status = ? WHERE id = ?',
+                                     (c.status, c.order_id))
+                        applied.append((c, row[0]))
+                    for hook in self.commit_hooks:
+                        # A failing hook is rolled back on its own; the orders
+                        # were already acknowledged and must still commit.
+                        conn.execute('SAVEPOINT commit_hook')
+                        try:
+                            hook(conn, orders, applied)
+                        except Exception:
+                            conn.execute('ROLLBACK TO commit_hook')
+                            self.logger.exception('Commit hook %s failed; batch saved without it',
+                                                  getattr(hook, '__qualname__', hook))
+                        conn.execute('RELEASE commit_hook')
+                break
+            except sqlite3.OperationalError:
+                if attempt == attempts - 1:
+                    return self._lost(batch)
+                time.sleep(0.1 * 2 ** attempt)
+            except Exception:
+                return self._lost(batch)
+        for c, previous in skipped:
+            if previous is None:
+                self.logger.warning('Skipped status change to %s: no order %s',
+                                    c.status, c.order_id)
+            else:
+                self.logger.warning('Skipped status change for order %s: %s -> %s not allowed',
+                                    c.order_id, previous, c.status)
+        if self.events is not None:
+            for o in orders:
+                self.events.publish('order', {'id': o.id, 'status': o.status,
+                                              'customer': o.customer}, key=o.id)
+            for c, _previous in applied:
+                self.events.publish('order', {'id': c.order_id, 'status': c.status}, key=c.order_id)
+
+    def _lost(self, batch):
+        self.logger.exception('Failed to write %d order update(s): %s', len(batch),
+                              ', '.join(getattr(e, 'id', None) or e.order_id for e in batch))
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import make_response, render_template, request
+from werkzeug.http import is_resource_modified
+
+
+class PageCache:
+    """Rendered-response cache for template-backed routes.
+
+    Pages are rendered once per (endpoint, path, template, context) key and
+    kept in a bounded LRU of ``max_entries`` pages. The query string is not
+    part of the key, so routes whose output depends on it must pass the
+    values they use as context. Every response carries a strong ETag
+    hashed from the rendered body, so browsers that already hold the page
+    get a bodiless 304. No Last-Modified is sent: the page also depends on
+    assets and data whose changes no single mtime captures. When any file
+    under the templates folder changes, the whole cache is dropped along
+    with Jinja's compiled templates, so the edit shows up even where
+    ``auto_reload`` is off.
+    """
+
+    def __init__(self, app=None, check_interval=None, max_entries=None):
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._template_dir = None
+        self._jinja_env = None
+        self._version = None
+        self._last_check = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._template_dir = os.path.join(app.root_path, app.template_folder or 'templates')
+        self._jinja_env = app.jinja_env
+        if self.check_interval is None:
+            self.check_interval = app.config.get('PAGE_CACHE_CHECK_INTERVAL', 1.0)
+        if self.max_entries is None:
+            self.max_entries = app.config.get('PAGE_CACHE_SIZE', 128)
+        app.extensions['page_cache'] = self
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _scan_templates(self):
+        newest = 0
+        count = 0
+        for root, _dirs, files in os.walk(self._template_dir):
+            for name in files:
+                try:
+                    mtime = os.stat(os.path.join(root, name)).st_mtime_ns
+                except OSError:
+                    continue
+                newest = max(newest, mtime)
+                count += 1
+        return newest, count
+
+    def _check_templates(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            version = self._scan_templates()
+            if version != self._version:
+                self._entries.clear()
+                if self._version is not None and self._jinja_env.cache is not None:
+                    # Without auto_reload Jinja would keep rendering the
+                    # template it compiled before the edit.
+                    self._jinja_env.cache.clear()
+                self._version = version
+
+    def _build_entry(self, template_name, context):
+        body = render_template(template_name, **context).encode('utf-8')
+        # The ETag covers the rendered bytes, so anything that changes the
+        # page (asset URLs, included templates, fragments) changes the tag.
+        return body, hashlib.sha256(body).hexdigest()[:32]
+
+    def render(self, template_name, **context):
+        """Render ``template_name`` through the cache and return a response."""
+        self._check_templates()
+        try:
+            key = (request.endpoint, request.path, template_name,
+                   frozenset(context.items()))
+        except TypeError:
+            # Unhashable context values cannot be keyed; render uncached.
+            return make_response(render_template(template_name, **context))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._build_entry(template_name, context)
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        body, etag = entry
+
+        if not is_resource_modified(request.environ, etag=etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(body)
+            response.content_type = 'text/html; charset=utf-8'
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,320 @@
+import csv
+import datetime
+import io
+import sqlite3
+import time
+
+import click
+from flask import Response, current_app, jsonify, request
+
+from orders import Order
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    hour TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL,
+    items INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL,
+    items INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS item_sales_daily (
+    day TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, item_id)
+);
+CREATE TABLE IF NOT EXISTS item_sales_total (
+    item_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups_stale (
+    since REAL NOT NULL
+);
+"""
+
+# Hours and days are bucketed in the server's local time, in Python and in
+# SQLite alike, so incremental updates and rebuilds agree.
+HOUR_SQL = "strftime('%Y-%m-%d %H:00', o.created_at, 'unixepoch', 'localtime')"
+DAY_SQL = "strftime('%Y-%m-%d', o.created_at, 'unixepoch', 'localtime')"
+COUNTED = "o.status != 'cancelled'"
+
+UPSERT_TOTALS = """
+INSERT INTO {table} VALUES (?, ?, ?, ?)
+ON CONFLICT({key}) DO UPDATE SET orders = orders + excluded.orders,
+    items = items + excluded.items, revenue_cents = revenue_cents + excluded.revenue_cents
+"""
+UPSERT_ITEM_DAILY = """
+INSERT INTO item_sales_daily VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(day, item_id) DO UPDATE SET name = excluded.name, qty = qty + excluded.qty,
+    revenue_cents = revenue_cents + excluded.revenue_cents
+"""
+UPSERT_ITEM_TOTAL = """
+INSERT INTO item_sales_total VALUES (?, ?, ?, ?)
+ON CONFLICT(item_id) DO UPDATE SET name = excluded.name, qty = qty + excluded.qty,
+    revenue_cents = revenue_cents + excluded.revenue_cents
+"""
+
+
+class ReportError(ValueError):
+    """Raised for invalid report query parameters."""
+
+
+def apply_orders(conn, orders, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) ``orders`` from every rollup."""
+    hourly = {}
+    daily = {}
+    item_daily = {}
+    item_total = {}
+    for o in orders:
+        hour = time.strftime('%Y-%m-%d %H:00', time.localtime(o.created_at))
+        day = hour[:10]
+        for key, table in ((hour, hourly), (day, daily)):
+            acc = table.setdefault(key, [0, 0, 0])
+            acc[0] += sign
+            acc[1] += sign * o.item_count
+            acc[2] += sign * o.total_cents
+        for item_id, name, qty, price in o.lines:
+            for key, table in (((day, item_id), item_daily), (item_id, item_total)):
+                acc = table.setdefault(key, [name, 0, 0])
+                acc[1] += sign * qty
+                acc[2] += sign * qty * price
+    conn.executemany(UPSERT_TOTALS.format(table='sales_hourly', key='hour'),
+                     [(k, *v) for k, v in hourly.items()])
+    conn.executemany(UPSERT_TOTALS.format(table='sales_daily', key='day'),
+                     [(k, *v) for k, v in daily.items()])
+    conn.executemany(UPSERT_ITEM_DAILY, [(*k, *v) for k, v in item_daily.items()])
+    conn.executemany(UPSERT_ITEM_TOTAL, [(k, *v) for k, v in item_total.items()])
+    if sign < 0:
+        # Drop buckets emptied by a cancellation so they match a rebuild.
+        conn.executemany('DELETE FROM sales_hourly WHERE hour = ? AND orders = 0',
+                         [(k,) for k in hourly])
+        conn.executemany('DELETE FROM sales_daily WHERE day = ? AND orders = 0',
+                         [(k,) for k in daily])
+        conn.executemany('DELETE FROM item_sales_daily WHERE day = ? AND item_id = ? AND qty = 0',
+                         list(item_daily))
+        conn.executemany('DELETE FROM item_sales_total WHERE item_id = ? AND qty = 0',
+                         [(k,) for k in item_total])
+
+
+def load_order(conn, order_id):
+    row = conn.execute('SELECT created_at, customer FROM orders WHERE id = ?', (order_id,)).fetchone()
+    lines = conn.execute('SELECT item_id, name, qty, unit_price_cents FROM order_items '
+                         'WHERE order_id = ?', (order_id,)).fetchall()
+    return Order(order_id, row[0], row[1], [tuple(line) for line in lines])
+
+
+def record_batch(conn, orders, status_changes):
+    """``OrderQueue`` commit hook keeping the rollups in step with orders.
+
+    New orders are added; an order moved to ``cancelled`` is taken back out,
+    and one moved out of ``cancelled`` is counted again.
+    """
+    apply_orders(conn, [o for o in orders if o.status != 'cancelled'])
+    for change, previous in status_changes:
+        if (change.status == 'cancelled') != (previous == 'cancelled'):
+            sign = -1 if change.status == 'cancelled' else 1
+            apply_orders(conn, [load_order(conn, change.order_id)], sign)
+
+
+def stale_since(conn):
+    """Return when the rollups fell out of step with the orders, or None."""
+    row = conn.execute('SELECT MIN(since) FROM rollups_stale').fetchone()
+    return row[0]
+
+
+def rebuild(conn):
+    """Recompute every rollup from the order tables in one transaction."""
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM rollups_stale')
+        for table in ('sales_hourly', 'sales_daily', 'item_sales_daily', 'item_sales_total'):
+            conn.execute('DELETE FROM %s' % table)
+        for table, bucket in (('sales_hourly', HOUR_SQL), ('sales_daily', DAY_SQL)):
+            conn.execute(
+                'INSERT INTO %s SELECT %s, COUNT(*), SUM(o.item_count), SUM(o.total_cents) '
+                'FROM orders o WHERE %s GROUP BY 1' % (table, bucket, COUNTED))
+        conn.execute(
+            'INSERT INTO item_sales_daily SELECT %s, i.item_id, MAX(i.name), SUM(i.qty), '
+            'SUM(i.qty * i.unit_price_cents) FROM orders o JOIN order_items i ON i.order_id = o.id '
+            'WHERE %s GROUP BY 1, 2' % (DAY_SQL, COUNTED))
+        conn.execute(
+            'INSERT INTO item_sales_total SELECT item_id, MAX(name), SUM(qty), SUM(revenue_cents) '
+            'FROM item_sales_daily GROUP BY item_id')
+    return conn.execute('SELECT COUNT(*), COALESCE(SUM(orders), 0) FROM sales_daily').fetchone()
+
+
+def _date_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ReportError('%s must be a date like 2024-01-31' % name) from None
+
+
+def _date_range(default_days):
+    today = datetime.date.today()
+    end = _date_arg('to', today)
+    start = _date_arg('from', end - datetime.timedelta(days=default_days - 1))
+    if start > end:
+        raise ReportError('from must not be after to')
+    return start.isoformat(), end.isoformat()
+
+
+def _csv_rows(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+class SalesReports:
+    """Sales rollups maintained as orders commit, served at ``/api/reports/*``.
+
+    ``record_batch`` runs as an ``OrderQueue`` commit hook, so hourly, daily
+    and per-item totals are updated in the same transaction as the orders
+    themselves. Report endpoints read only those rollup tables; their cost
+    depends on the date range asked for, never on how many orders exist.
+    Every endpoint takes ``format=csv`` to stream the rows as CSV.
+    ``flask rebuild-reports`` recomputes the rollups from scratch. If the
+    rollup update for a batch fails, the orders are saved regardless and
+    the rollups are marked stale until the next rebuild.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        orders = app.extensions['orders']
+        self.path = orders.path
+        self.logger = app.logger
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.executescript(SCHEMA)
+            since = stale_since(conn)
+        finally:
+            conn.close()
+        if since is not None:
+            self.logger.warning('Sales rollups have been stale since %s; run flask rebuild-reports',
+                                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(since)))
+        orders.commit_hooks.append(self.record)
+        for name in ('hourly', 'daily', 'summary', 'top_items'):
+            app.add_url_rule('/api/reports/' + name.replace('_', '-'), 'report_' + name,
+                             getattr(self, name))
+        app.register_error_handler(ReportError, lambda exc: (jsonify(error=str(exc)), 400))
+        app.cli.add_command(rebuild_reports_command)
+        app.extensions['reports'] = self
+
+    def record(self, conn, orders, status_changes):
+        """Commit hook: ``record_batch``, falling back to marking the rollups stale."""
+        conn.execute('SAVEPOINT rollups')
+        try:
+            record_batch(conn, orders, status_changes)
+        except Exception:
+            conn.execute('ROLLBACK TO rollups')
+            conn.execute('INSERT INTO rollups_stale VALUES (?)', (time.time(),))
+            self.logger.exception('Sales rollups are stale, run flask rebuild-reports')
+        conn.execute('RELEASE rollups')
+
+    def _connect(self):
+        conn = sqlite3.connect('file:%s?mode=ro' % self.path, uri=True, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _respond(self, sql, params, columns, name):
+        conn = self._connect()
+        cursor = conn.execute(sql, params)
+        if request.args.get('format') == 'csv':
+            def rows():
+                try:
+                    for row in cursor:
+                        yield [row[c] for c in columns]
+                finally:
+                    conn.close()
+            response = Response(_csv_rows(columns, rows()), mimetype='text/csv')
+            response.headers['Content-Disposition'] = 'attachment; filename=%s.csv' % name
+            return response
+        try:
+            return jsonify(rows=[{c: row[c] for c in columns} for row in cursor])
+        finally:
+            conn.close()
+
+    def hourly(self):
+        start, end = _date_range(1)
+        return self._respond(
+            'SELECT hour, orders, items, revenue_cents / 100.0 AS revenue, '
+            'revenue_cents / 100.0 / orders AS average_ticket FROM sales_hourly '
+            'WHERE hour >= ? AND hour < ? AND orders > 0 ORDER BY hour',
+            (start, end + '~'),
+            ('hour', 'orders', 'items', 'revenue', 'average_ticket'), 'sales-hourly')
+
+    def daily(self):
+        start, end = _date_range(30)
+        return self._respond(
+            'SELECT day, orders, items, revenue_cents / 100.0 AS revenue, '
+            'revenue_cents / 100.0 / orders AS average_ticket FROM sales_daily '
+            'WHERE day BETWEEN ? AND ? AND orders > 0 ORDER BY day',
+            (start, end),
+            ('day', 'orders', 'items', 'revenue', 'average_ticket'), 'sales-daily')
+
+    def summary(self):
+        start, end = _date_range(30)
+        return self._respond(
+            'SELECT ? AS "from", ? AS "to", COALESCE(SUM(orders), 0) AS orders, '
+            'COALESCE(SUM(items), 0) AS items, COALESCE(SUM(revenue_cents), 0) / 100.0 AS revenue, '
+            'SUM(revenue_cents) / 100.0 / NULLIF(SUM(orders), 0) AS average_ticket '
+            'FROM sales_daily WHERE day BETWEEN ? AND ?',
+            (start, end, start, end),
+            ('from', 'to', 'orders', 'items', 'revenue', 'average_ticket'), 'sales-summary')
+
+    def top_items(self):
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            raise ReportError('limit must be an integer') from None
+        if not 1 <= limit <= 100:
+            raise ReportError('limit must be between 1 and 100')
+        by = request.args.get('by', 'qty')
+        if by not in ('qty', 'revenue'):
+            raise ReportError('by must be qty or revenue')
+        columns = ('item_id', 'name', 'qty', 'revenue')
+        if 'from' not in request.args and 'to' not in request.args:
+            return self._respond(
+                'SELECT item_id, name, qty, revenue_cents / 100.0 AS revenue FROM item_sales_total '
+                'WHERE qty > 0 ORDER BY %s DESC, item_id LIMIT ?' % by,
+                (limit,), columns, 'top-items')
+        start, end = _date_range(30)
+        return self._respond(
+            'SELECT item_id, MAX(name) AS name, SUM(qty) AS qty, '
+            'SUM(revenue_cents) / 100.0 AS revenue FROM item_sales_daily '
+            'WHERE day BETWEEN ? AND ? GROUP BY item_id HAVING SUM(qty) > 0 '
+            'ORDER BY %s DESC, item_id LIMIT ?' % by,
+            (start, end, limit), columns, 'top-items')
+
+
+@click.command('rebuild-reports')
+def rebuild_reports_command():
+    """Recompute the sales rollups from all recorded orders."""
+    conn = sqlite3.connect(current_app.extensions['reports'].path, timeout=30,
+                           isolation_level=None)
+    try:
+        days, orders = rebuild(conn)
+    finally:
+        conn.close()
+    click.echo('Rebuilt sales rollups: %d order(s) across %d day(s)' % (orders, days))
@@ -0,0 +1,219 @@
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+import click
+from flask import current_app
+from werkzeug.serving import make_server
+
+
+class Worker:
+    """One forked child serving requests from the shared listening socket.
+
+    On stop or recycle the worker stops accepting, lets the requests it
+    already took finish (joining their threads under ``--threaded``) and
+    only then runs the shutdown hooks.
+    """
+
+    def __init__(self, app, listener, max_requests=0, threaded=False):
+        self.app = app
+        self.listener = listener
+        self.max_requests = max_requests
+        self.threaded = threaded
+        self.handled = 0
+        self.running = True
+        self._lock = threading.Lock()
+
+    def stop(self, *_args):
+        self.running = False
+        # Open event streams never return on their own; end them so the
+        # worker can finish its shutdown hooks before the master kills it.
+        events = self.app.extensions.get('events')
+        if events is not None:
+            events.close()
+
+    def wsgi_app(self, environ, start_response):
+        with self._lock:
+            self.handled += 1
+            if self.max_requests and self.handled >= self.max_requests:
+                self.running = False
+        return self.app(environ, start_response)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGHUP, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        host, port = self.listener.getsockname()[:2]
+        server = make_server(host, port, self.wsgi_app, threaded=self.threaded,
+                             fd=self.listener.fileno())
+        # All workers share the descriptor; a worker that loses the race for
+        # a connection must get EAGAIN rather than block inside accept().
+        server.socket.setblocking(False)
+        server.timeout = 0.5
+        # Werkzeug runs request threads as daemons, which os._exit() would
+        # kill mid-response; keep them joinable so server_close() waits.
+        server.daemon_threads = False
+        while self.running:
+            server.handle_request()
+        # Recycling ends the loop without stop(); either way, end open event
+        # streams so their threads can be joined.
+        self.stop()
+        server.server_close()
+        for hook in self.app.extensions.get('shutdown_hooks', ()):
+            hook()
+
+
+class Arbiter:
+    """Pre-fork master: owns the listening socket and keeps N workers alive.
+
+    SIGHUP rebuilds the app from ``app_factory`` and replaces every worker
+    once the old ones finish their current request; if the rebuild fails the
+    current app and workers stay in place. SIGTERM/SIGINT stop the workers
+    gracefully and exit. Workers that reach ``max_requests`` exit on their
+    own and are respawned.
+    """
+
+    def __init__(self, app_factory, host, port, workers, max_requests=0,
+                 threaded=False, backlog=2048):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.threaded = threaded
+        self.backlog = backlog
+        self.workers = {}
+        self.stopping = False
+        self.reload_requested = False
+
+    def bind(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(self.backlog)
+        listener.set_inheritable(True)
+        return listener
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        code = 0
+        try:
+            Worker(self.app, self.listener, self.max_requests, self.threaded).run()
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def signal_workers(self, signum, pids=None):
+        for pid in list(pids if pids is not None else self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+    def handle_stop(self, *_args):
+        self.stopping = True
+
+    def handle_reload(self, *_args):
+        self.reload_requested = True
+
+    def reload(self):
+        self.reload_requested = False
+        try:
+            app = self.app_factory()
+        except Exception:
+            traceback.print_exc()
+            click.echo('Reload failed; keeping the current app and workers.', err=True)
+            return
+        self.app = app
+        old = list(self.workers)
+        for _ in range(self.num_workers):
+            self.spawn()
+        self.signal_workers(signal.SIGTERM, old)
+        click.echo('Reloaded: replaced %d worker(s).' % len(old))
+
+    def reap(self):
+        while True:
+            try:
+                pid, _status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            self.workers.pop(pid, None)
+
+    def run(self, app):
+        self.app = app
+        self.listener = self.bind()
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        for _ in range(self.num_workers):
+            self.spawn()
+        click.echo('Serving on http://%s:%d with %d worker(s) (pid %d)'
+                   % (self.host, self.port, self.num_workers, os.getpid()))
+        try:
+            while not self.stopping:
+                if self.reload_requested:
+                    self.reload()
+                self.reap()
+                while len(self.workers) < self.num_workers and not self.stopping:
+                    self.spawn()
+                time.sleep(0.2)
+        finally:
+            self.signal_workers(signal.SIGTERM)
+            deadline = time.monotonic() + 10
+            while self.workers and time.monotonic() < deadline:
+                self.reap()
+                time.sleep(0.05)
+            self.signal_workers(signal.SIGKILL)
+            self.reap()
+            self.listener.close()
+
+
+def format_timings(timings):
+    total = sum(timings.values())
+    parts = ', '.join('%s %.1f ms' % (name.replace('_', ' '), seconds * 1000)
+                      for name, seconds in timings.items())
+    return 'Startup %.1f ms (%s)' % (total * 1000, parts)
+
+
+@click.command('serve')
+@click.option('--host', default=None, help='Interface to bind (default from config).')
+@click.option('--port', type=int, default=None, help='Port to bind (default from config).')
+@click.option('--workers', '-w', type=int, default=None,
+              help='Number of worker processes (default from config).')
+@click.option('--max-requests', type=int, default=None,
+              help='Recycle a worker after this many requests; 0 disables.')
+@click.option('--threaded/--no-threaded', default=False,
+              help='Handle each connection in its own thread inside a worker.')
+@click.option('--config', 'config_name', default=None,
+              help='Config profile to build each app with (dev/prod).')
+def serve_command(host, port, workers, max_requests, threaded, config_name):
+    """Run the app on a pre-forked pool of worker processes."""
+    if not hasattr(os, 'fork'):
+        raise click.ClickException('flask serve needs a POSIX platform with fork().')
+    from app import create_app
+
+    def app_factory():
+        return create_app(config_name)
+
+    app = app_factory() if config_name else current_app._get_current_object()
+    cfg = app.config
+    click.echo(format_timings(app.extensions['startup_timings']))
+    Arbiter(
+        app_factory,
+        host or cfg['SERVE_HOST'],
+        port or cfg['SERVE_PORT'],
+        workers or cfg['SERVE_WORKERS'],
+        cfg['SERVE_MAX_REQUESTS'] if max_requests is None else max_requests,
+        threaded,
+    ).run(app)
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import click
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """Bounded LRU of rendered template fragments with per-entry TTL."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key, ttl %}...{% endcache %}`` backed by a ``FragmentCache``.
+
+    ``ttl`` is optional and defaults to ``FRAGMENT_CACHE_TTL``. Keys are
+    scoped to the tag's position in one compilation of the template, so
+    editing the template never serves fragments rendered from the old
+    source.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache(), fragment_cache_ttl=300)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        scope = '%s:%d:%s' % (parser.name, lineno, uuid.uuid4().hex)
+        args = [nodes.Const(scope), parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', args), [], [], body).set_lineno(lineno)
+
+    def _cache(self, scope, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        full_key = (scope, key)
+        value = cache.get(full_key)
+        if value is None:
+            value = caller()
+            cache.set(full_key, value, self.environment.fragment_cache_ttl if ttl is None else ttl)
+        return value
+
+
+def init_templating(app):
+    """Attach the on-disk bytecode cache and fragment cache to ``app.jinja_env``."""
+    env = app.jinja_env
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        directory = app.config.get('TEMPLATE_BYTECODE_DIR') or os.path.join(app.instance_path, 'jinja')
+        os.makedirs(directory, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(directory)
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache.maxsize = app.config.get('FRAGMENT_CACHE_SIZE', 256)
+    env.fragment_cache_ttl = app.config.get('FRAGMENT_CACHE_TTL', 300)
+    app.extensions['fragment_cache'] = env.fragment_cache
+    app.cli.add_command(precompile_templates_command)
+
+
+def precompile_templates(app):
+    """Compile every template so its bytecode is cached; return the names."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+@click.command('precompile-templates')
+def precompile_templates_command():
+    """Compile all templates into the Jinja bytecode cache."""
+    names = precompile_templates(current_app)
+    bytecode_cache = current_app.jinja_env.bytecode_cache
+    target = bytecode_cache.directory if bytecode_cache is not None else 'memory only'
+    click.echo('Compiled %d template(s) into %s' % (len(names), target))
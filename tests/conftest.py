@@ -0,0 +1,34 @@
+import pytest
+
+from app import create_app
+from config import DevConfig
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    apps = []
+
+    def make(**overrides):
+        config = type('TestConfig', (DevConfig,), {
+            'TESTING': True,
+            'TEMPLATE_BYTECODE_CACHE': False,
+            'ORDERS_DB': str(tmp_path / 'orders.sqlite3'),
+            **overrides,
+        })
+        app = create_app(config)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.extensions['orders'].close()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
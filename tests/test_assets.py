@@ -0,0 +1,44 @@
+import gzip
+import os
+
+import pytest
+
+
+@pytest.fixture
+def css_url(app):
+    with app.test_request_context():
+        return app.extensions['assets'].asset_url('css/style.css')
+
+
+def test_asset_urls_are_content_hashed(app, css_url):
+    assert css_url.startswith('/assets/css/style.') and css_url != '/assets/css/style.css'
+    with app.test_request_context():
+        assert app.extensions['assets'].asset_url('missing.css') == '/static/missing.css'
+
+
+@pytest.mark.parametrize('accept, compressed', [
+    ('gzip', True),
+    ('br, gzip;q=0.5', True),
+    ('gzip;q=0', False),
+    ('identity', False),
+    (None, False),
+])
+def test_gzip_follows_accept_encoding(app, client, css_url, accept, compressed):
+    headers = {'Accept-Encoding': accept} if accept else {}
+    response = client.get(css_url, headers=headers)
+    assert response.status_code == 200
+    assert 'Accept-Encoding' in response.vary
+    assert response.cache_control.immutable
+    body = response.get_data()
+    if compressed:
+        assert response.content_encoding == 'gzip'
+        body = gzip.decompress(body)
+    else:
+        assert response.content_encoding is None
+    with open(os.path.join(app.static_folder, 'css', 'style.css'), 'rb') as f:
+        assert body == f.read()
+
+
+def test_build_files_are_not_served_directly(client, css_url):
+    assert client.get(css_url + '.gz').status_code == 404
+    assert client.get('/assets/manifest.json').status_code == 404
@@ -0,0 +1,64 @@
+import copy
+import json
+
+import pytest
+
+import bench
+
+BASELINE = {
+    'settings': {'config': 'prod', 'workers': 2},
+    'results': {
+        'server.home': {'requests': 1000, 'errors': 0, 'rps': 200.0, 'mean_ms': 5.0,
+                        'p50_ms': 4.0, 'p95_ms': 9.0, 'p99_ms': 12.0},
+        'inprocess.home': {'requests': 2000, 'errors': 0, 'rps': 900.0, 'mean_ms': 1.0,
+                           'p50_ms': 1.0, 'p95_ms': 1.5, 'p99_ms': 2.0},
+    },
+}
+
+
+def run_compare(tmp_path, current, *extra):
+    paths = []
+    for name, report in (('baseline', BASELINE), ('current', current)):
+        path = tmp_path / ('%s.json' % name)
+        path.write_text(json.dumps(report))
+        paths.append(str(path))
+    return bench.main(['compare', *paths, *extra])
+
+
+def changed(name, **stats):
+    report = copy.deepcopy(BASELINE)
+    report['results'][name].update(stats)
+    return report
+
+
+def test_unchanged_results_pass(tmp_path, capsys):
+    assert run_compare(tmp_path, BASELINE) == 0
+    assert 'No regressions' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('stats', [
+    {'p95_ms': 11.0},
+    {'rps': 160.0},
+    {'errors': 1},
+])
+def test_regressions_fail(tmp_path, stats):
+    assert run_compare(tmp_path, changed('server.home', **stats)) == 1
+
+
+def test_change_within_threshold_passes(tmp_path):
+    assert run_compare(tmp_path, changed('server.home', p95_ms=10.0, rps=180.0)) == 0
+    assert run_compare(tmp_path, changed('server.home', p95_ms=10.0), '--threshold', '0.05') == 1
+
+
+def test_missing_benchmark_fails(tmp_path, capsys):
+    current = copy.deepcopy(BASELINE)
+    del current['results']['server.home']
+    assert run_compare(tmp_path, current) == 1
+    assert 'server.home' in capsys.readouterr().out
+
+
+def test_differing_settings_warn(tmp_path, capsys):
+    current = copy.deepcopy(BASELINE)
+    current['settings']['workers'] = 4
+    assert run_compare(tmp_path, current) == 0
+    assert "setting 'workers' differs" in capsys.readouterr().err
@@ -0,0 +1,57 @@
+from flask import Flask
+
+from events import EventBroadcaster
+
+
+def make_events(**options):
+    return EventBroadcaster(Flask(__name__), **options)
+
+
+def ids(data):
+    return [line for line in data.split(b'\n') if line.startswith(b'id: ')]
+
+
+def test_reconnect_replays_missed_events():
+    events = make_events(replay_size=8)
+    for n in range(3):
+        events.publish('order', {'n': n})
+    subscriber, backlog = events._subscribe(1)
+    assert ids(b''.join(backlog)) == [b'id: 2', b'id: 3']
+    events.publish('order', {'n': 3})
+    assert ids(events._drain(subscriber)) == [b'id: 4']
+
+
+def test_reconnect_past_the_replay_log_gets_reset():
+    events = make_events(replay_size=2)
+    for n in range(5):
+        events.publish('order', {'n': n})
+    _subscriber, backlog = events._subscribe(1)
+    assert backlog == [b'event: reset\ndata: {}\n\n']
+    _subscriber, backlog = events._subscribe(99)
+    assert backlog == [b'event: reset\ndata: {}\n\n']
+
+
+def test_slow_subscriber_overflows_and_keys_coalesce():
+    events = make_events(buffer_size=2)
+    subscriber, _backlog = events._subscribe(None)
+    events.publish('order', {'status': 'received'}, key='a')
+    events.publish('order', {'status': 'ready'}, key='a')
+    events.publish('order', {'n': 1})
+    events.publish('order', {'n': 2})
+    data = events._drain(subscriber)
+    assert data.startswith(b'event: overflow\ndata: {"dropped":1}\n\n')
+    assert b'"ready"' not in data and b'"received"' not in data
+    assert ids(data) == [b'id: 3', b'id: 4']
+
+
+def test_stream_needs_a_threaded_server():
+    app = Flask(__name__)
+    events = EventBroadcaster(app)
+    client = app.test_client()
+    assert client.get('/events').status_code == 503
+
+    events.close()
+    response = client.get('/events', environ_overrides={'wsgi.multithread': True})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data().startswith(b'retry: 3000\n\n')
@@ -0,0 +1,67 @@
+import pytest
+
+from menu import MenuError, MenuItem
+
+
+def menu(client, **params):
+    response = client.get('/api/menu', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_filters(client):
+    coffee = menu(client, category='coffee')
+    assert coffee['total'] == len(coffee['items']) > 0
+    assert {item['category'] for item in coffee['items']} == {'coffee'}
+
+    vegan = menu(client, tag='vegan', sort='price')
+    assert all('vegan' in item['tags'] for item in vegan['items'])
+    prices = [item['price'] for item in vegan['items']]
+    assert prices == sorted(prices)
+
+    flat = menu(client, q='fla')
+    assert [item['id'] for item in flat['items']] == ['flat-white']
+
+    unavailable = menu(client, available='false')
+    assert [item['id'] for item in unavailable['items']] == ['iced-lemon-tea']
+
+
+@pytest.mark.parametrize('sort', ['name', '-name', 'price', '-price', 'category', '-category'])
+def test_cursor_paging_walks_every_item_once(client, sort):
+    everything = menu(client, sort=sort, limit=200)
+    assert everything['next_cursor'] is None
+
+    seen = []
+    params = {'sort': sort, 'limit': 4}
+    while True:
+        page = menu(client, **params)
+        assert len(page['items']) <= 4
+        seen.extend(item['id'] for item in page['items'])
+        if page['next_cursor'] is None:
+            break
+        params['cursor'] = page['next_cursor']
+    assert seen == [item['id'] for item in everything['items']]
+
+
+def test_bad_queries_are_rejected(client):
+    cursor = menu(client, sort='price', limit=2)['next_cursor']
+    for params in ({'sort': 'colour'}, {'limit': 0}, {'available': 'maybe'},
+                   {'cursor': 'not-a-cursor'}, {'sort': 'name', 'cursor': cursor}):
+        response = client.get('/api/menu', query_string=params)
+        assert response.status_code == 400
+
+
+def test_query_without_words_matches_nothing(client):
+    assert menu(client, q='!!!') == {'items': [], 'total': 0, 'next_cursor': None}
+    assert menu(client, q='')['total'] == menu(client)['total']
+
+
+@pytest.mark.parametrize('price', ['2.205', '-1', 'NaN'])
+def test_prices_must_be_whole_non_negative_cents(price):
+    with pytest.raises(MenuError, match='price'):
+        MenuItem.from_dict({'id': 'x', 'name': 'X', 'category': 'coffee', 'price': price})
+
+
+def test_prices_are_kept_exactly():
+    assert MenuItem.from_dict({'id': 'x', 'name': 'X', 'category': 'coffee',
+                               'price': 2.2}).price_cents == 220
@@ -0,0 +1,38 @@
+def samples(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    values = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+def test_requests_are_counted_and_timed(client):
+    client.get('/')
+    client.get('/')
+    client.get('/api/menu', query_string={'limit': 0})
+    values = samples(client)
+
+    assert values['pqcafe_http_requests_total{endpoint="home",method="GET",status="200"}'] == 2
+    assert values['pqcafe_http_requests_total{endpoint="menu_api",method="GET",status="400"}'] == 1
+    assert values['pqcafe_http_request_duration_seconds_count{endpoint="home"}'] == 2
+    assert values['pqcafe_http_request_duration_seconds_bucket{endpoint="home",le="+Inf"}'] == 2
+    buckets = [v for k, v in values.items()
+               if k.startswith('pqcafe_http_request_duration_seconds_bucket{endpoint="home"')]
+    assert buckets == sorted(buckets)
+    # The page cache renders index.html once; the repeat is served from memory.
+    assert values['pqcafe_template_render_seconds_count{template="index.html"}'] == 1
+    assert values['pqcafe_orders_pending'] == 0
+    assert values['pqcafe_event_subscribers'] == 0
+
+
+def test_slow_requests_are_logged(make_app, caplog):
+    app = make_app(METRICS_SLOW_REQUEST_MS=0)
+    app.test_client().get('/')
+    slow = [r.getMessage() for r in caplog.records if r.getMessage().startswith('Slow request')]
+    assert len(slow) == 1
+    assert slow[0].startswith('Slow request GET / -> 200:')
+    assert 'render' in slow[0]
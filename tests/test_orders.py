@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+
+
+def test_full_queue_answers_429(make_app):
+    app = make_app(ORDERS_QUEUE_SIZE=1, ORDERS_BATCH_SIZE=1, ORDERS_RETRY_AFTER=7)
+    orders = app.extensions['orders']
+    writing = threading.Event()
+    release = threading.Event()
+
+    def hold(conn, batch, changes):
+        writing.set()
+        release.wait(10)
+
+    orders.commit_hooks.append(hold)
+    client = app.test_client()
+    order = {'items': [{'id': 'espresso'}]}
+    try:
+        assert client.post('/orders', json=order).status_code == 202
+        assert writing.wait(10)
+        # The writer is stuck on the first order; the second fills the queue.
+        assert client.post('/orders', json=order).status_code == 202
+        busy = client.post('/orders', json=order)
+        assert busy.status_code == 429
+        assert busy.headers['Retry-After'] == '7'
+        status = client.post('/orders/%s/status' % ('0' * 32), json={'status': 'ready'})
+        assert status.status_code == 429
+    finally:
+        release.set()
+    orders.close()
+    assert orders.pending() == 0
+
+
+def test_invalid_order_is_rejected(client):
+    response = client.post('/orders', json={'items': [{'id': 'iced-lemon-tea'}]})
+    assert response.status_code == 400
+    assert 'not available' in response.get_json()['error']
+
+
+def test_closed_queue_answers_503(app, client):
+    order = {'items': [{'id': 'espresso'}]}
+    assert client.post('/orders', json=order).status_code == 202
+    orders = app.extensions['orders']
+    orders.close()
+    response = client.post('/orders', json=order)
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert orders.pending() == 0
+
+
+def test_status_changes_follow_the_kitchen_flow(app, client, caplog):
+    order_id = client.post('/orders', json={'items': [{'id': 'espresso'}]}).get_json()['id']
+    for status in ('ready', 'received', 'collected', 'cancelled'):
+        assert client.post('/orders/%s/status' % order_id,
+                           json={'status': status}).status_code == 202
+    unknown = '0' * 32
+    assert client.post('/orders/%s/status' % unknown, json={'status': 'ready'}).status_code == 202
+    assert client.post('/orders/nope/status', json={'status': 'ready'}).status_code == 404
+    orders = app.extensions['orders']
+    orders.close()
+
+    conn = sqlite3.connect(orders.path)
+    status = conn.execute('SELECT status FROM orders WHERE id = ?', (order_id,)).fetchone()[0]
+    conn.close()
+    assert status == 'collected'
+    skipped = [r.getMessage() for r in caplog.records if 'Skipped status change' in r.getMessage()]
+    assert len(skipped) == 3
+    assert any('ready -> received' in message for message in skipped)
+    assert any('no order ' + unknown in message for message in skipped)
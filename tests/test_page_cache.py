@@ -0,0 +1,53 @@
+import os
+
+import jinja2
+
+
+def test_repeat_visit_gets_304(client):
+    first = client.get('/')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'Last-Modified' not in first.headers
+
+    again = client.get('/')
+    assert again.headers['ETag'] == etag
+    assert again.get_data() == first.get_data()
+
+    cached = client.get('/', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert cached.headers['ETag'] == etag
+
+
+def test_stale_etag_gets_full_page(client):
+    response = client.get('/', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    assert response.get_data()
+
+
+def test_query_string_shares_the_cached_page(app, client):
+    client.get('/')
+    client.get('/?utm_source=a')
+    client.get('/?utm_source=b')
+    assert len(app.extensions['page_cache']._entries) == 1
+
+
+def test_template_edit_shows_without_auto_reload(make_app, tmp_path):
+    app = make_app(DEBUG=False)
+    assert not app.jinja_env.auto_reload
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    page = templates / 'page.html'
+    page.write_text('old text')
+    cache = app.extensions['page_cache']
+    cache._template_dir = str(templates)
+    app.jinja_env.loader = jinja2.ChoiceLoader([jinja2.FileSystemLoader(str(templates)),
+                                                app.jinja_env.loader])
+    app.add_url_rule('/page', 'page', lambda: cache.render('page.html'))
+    client = app.test_client()
+    assert client.get('/page').get_data() == b'old text'
+
+    page.write_text('new text')
+    mtime = page.stat().st_mtime + 10
+    os.utime(page, (mtime, mtime))
+    assert client.get('/page').get_data() == b'new text'
@@ -0,0 +1,109 @@
+import sqlite3
+
+import reports
+from reports import rebuild, stale_since
+
+ROLLUPS = ('sales_hourly', 'sales_daily', 'item_sales_daily', 'item_sales_total')
+
+
+def rollups(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute('SELECT * FROM %s ORDER BY 1, 2' % table).fetchall()
+                for table in ROLLUPS}
+    finally:
+        conn.close()
+
+
+def rebuilt(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        rebuild(conn)
+    finally:
+        conn.close()
+    return rollups(path)
+
+
+def place(client, *lines):
+    response = client.post('/orders', json={'items': [{'id': i, 'qty': q} for i, q in lines]})
+    assert response.status_code == 202
+    return response.get_json()['id']
+
+
+def set_status(client, order_id, status):
+    response = client.post('/orders/%s/status' % order_id, json={'status': status})
+    assert response.status_code == 202
+
+
+def test_rollups_follow_create_cancel_and_uncancel(make_app):
+    # One entry per transaction, so every status change lands in its own batch.
+    app = make_app(ORDERS_BATCH_SIZE=1)
+    client = app.test_client()
+    kept = place(client, ('espresso', 2), ('flat-white', 1))
+    cancelled = place(client, ('americano', 3))
+    restored = place(client, ('espresso', 1))
+    set_status(client, cancelled, 'cancelled')
+    set_status(client, restored, 'cancelled')
+    set_status(client, restored, 'received')
+    set_status(client, kept, 'ready')
+    app.extensions['orders'].close()
+
+    path = app.extensions['orders'].path
+    incremental = rollups(path)
+    assert incremental == rebuilt(path)
+
+    daily = incremental['sales_daily']
+    assert [row[1:] for row in daily] == [(2, 4, 2 * 220 + 320 + 220)]
+    assert {row[0] for row in incremental['item_sales_total']} == {'espresso', 'flat-white'}
+
+
+def test_cancelling_the_only_order_empties_the_rollups(make_app):
+    app = make_app()
+    client = app.test_client()
+    order_id = place(client, ('espresso', 1))
+    set_status(client, order_id, 'cancelled')
+    app.extensions['orders'].close()
+
+    path = app.extensions['orders'].path
+    assert rollups(path) == rebuilt(path) == {table: [] for table in ROLLUPS}
+
+
+def saved_orders(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute('SELECT id FROM orders')}
+    finally:
+        conn.close()
+
+
+def test_failing_commit_hook_does_not_lose_orders(app, client):
+    def broken(conn, orders, changes):
+        conn.execute('DELETE FROM orders')
+        raise RuntimeError('hook bug')
+
+    orders = app.extensions['orders']
+    orders.commit_hooks.insert(0, broken)
+    placed = {place(client, ('espresso', 1)), place(client, ('americano', 2))}
+    orders.close()
+
+    assert saved_orders(orders.path) == placed
+    assert rollups(orders.path) == rebuilt(orders.path)
+
+
+def test_failing_rollup_marks_reports_stale(app, client, monkeypatch):
+    def broken(conn, orders, sign=1):
+        raise RuntimeError('rollup bug')
+
+    monkeypatch.setattr(reports, 'apply_orders', broken)
+    order_id = place(client, ('espresso', 1))
+    orders = app.extensions['orders']
+    orders.close()
+
+    path = orders.path
+    assert saved_orders(path) == {order_id}
+    conn = sqlite3.connect(path)
+    assert stale_since(conn) is not None
+    monkeypatch.undo()
+    assert rebuilt(path)['sales_daily'][0][1] == 1
+    assert stale_since(conn) is None
+    conn.close()
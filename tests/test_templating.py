@@ -0,0 +1,53 @@
+import jinja2
+
+import templating
+from templating import FragmentCache, FragmentCacheExtension
+
+
+def test_fragment_cache_evicts_least_recently_used():
+    cache = FragmentCache(maxsize=2)
+    cache.set('a', 'A', 60)
+    cache.set('b', 'B', 60)
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C', 60)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+
+
+def test_fragment_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(templating.time, 'monotonic', lambda: now[0])
+    cache = FragmentCache()
+    cache.set('a', 'A', 10)
+    now[0] += 9
+    assert cache.get('a') == 'A'
+    now[0] += 2
+    assert cache.get('a') is None
+    assert not cache._entries
+
+
+def make_env(source):
+    return jinja2.Environment(loader=jinja2.DictLoader({'page.html': source}),
+                              extensions=[FragmentCacheExtension])
+
+
+def test_cache_tag_reuses_fragments_by_key():
+    env = make_env('{% cache key, 60 %}{{ n }}{% endcache %}')
+    template = env.get_template('page.html')
+    assert template.render(key='a', n=1) == '1'
+    assert template.render(key='a', n=2) == '1'
+    assert template.render(key='b', n=3) == '3'
+
+
+def test_recompiled_template_does_not_reuse_old_fragments():
+    env = make_env('{% cache "menu" %}{{ n }}{% endcache %}')
+    assert env.get_template('page.html').render(n=1) == '1'
+    env.cache.clear()
+    assert env.get_template('page.html').render(n=2) == '2'
+
+
+def test_app_sizes_the_fragment_cache_from_config(make_app):
+    app = make_app(FRAGMENT_CACHE_SIZE=3, FRAGMENT_CACHE_TTL=7)
+    assert app.extensions['fragment_cache'] is app.jinja_env.fragment_cache
+    assert app.jinja_env.fragment_cache.maxsize == 3
+    assert app.jinja_env.fragment_cache_ttl == 7